@@ -1,12 +1,53 @@
 """Module containing all database methods
 """
 
+from abc import ABC, abstractmethod
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from bson import json_util, ObjectId
+import copy
 import json
+import threading
 
 
-class MongoDatabase:
+class Database(ABC):
+    """Storage interface used by the APIs in main.py
+    """
+
+    @abstractmethod
+    def get_all(self):
+        """Get all users, with "_id" as a string"""
+
+    @abstractmethod
+    def get_id(self, user_id):
+        """Get one user, with "_id" as {"$oid": str}. None if not found"""
+
+    @abstractmethod
+    def create_user(self, new_data):
+        """Insert a user and return the new user's id as a string"""
+
+    @abstractmethod
+    def update(self, user_id, new_data) -> int:
+        """Set fields of a user and return the number of modified users"""
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a user and return {'deleted_count': int}"""
+
+    @abstractmethod
+    def validate_user(self, user_id):
+        """Return True if user_id exists, else False"""
+
+    @abstractmethod
+    def add_friend(self, user_id, friend_id):
+        """Append friend_id to the user's friend list"""
+
+    @abstractmethod
+    def remove_friend(self, user_id, friend_id):
+        """Remove friend_id from the user's friend list"""
+
+
+class MongoDatabase(Database):
     def __init__(self, testing=False) -> None:
         """Init
         """
@@ -139,4 +180,228 @@ class MongoDatabase:
                 return {user_id: "friend not found in list"}
         else:
             return {user_id: "unable to validate"}
-    
\ No newline at end of file
+
+
+class MemoryDatabase(Database):
+    def __init__(self, testing=False) -> None:
+        """Init
+
+        Users are held in a dict keyed by their id, with secondary indexes
+        on name and on friends for embedded use (get_by_name,
+        get_friend_of). All methods are guarded by a lock so that a single
+        instance can be shared between request threads.
+        """
+        self.users = {}
+        # Secondary indexes: name -> set of ids, friend_id -> set of ids
+        self.names = {}
+        self.friend_of = {}
+        self.lock = threading.RLock()
+
+    def _index(self, user_id, user):
+        name = user.get("name")
+        if name is not None:
+            self.names.setdefault(name, set()).add(user_id)
+        friends = user.get("friends")
+        if isinstance(friends, list):
+            for friend_id in friends:
+                if not isinstance(friend_id, str):
+                    continue
+                self.friend_of.setdefault(friend_id, set()).add(user_id)
+
+    def _unindex(self, user_id, user):
+        name = user.get("name")
+        if name in self.names:
+            self.names[name].discard(user_id)
+            if not self.names[name]:
+                del self.names[name]
+        friends = user.get("friends")
+        if isinstance(friends, list):
+            for friend_id in friends:
+                if isinstance(friend_id, str) and friend_id in self.friend_of:
+                    self.friend_of[friend_id].discard(user_id)
+                    if not self.friend_of[friend_id]:
+                        del self.friend_of[friend_id]
+
+    def _output(self, user_id, user):
+        output = copy.deepcopy(user)
+        output["_id"] = {"$oid": user_id}
+        return output
+
+    def get_all(self):
+        """Get all users
+
+        Returns:
+            list: List of users
+        """
+        with self.lock:
+            users = []
+            for user_id, user in self.users.items():
+                output = copy.deepcopy(user)
+                output["_id"] = user_id
+                users.append(output)
+            return users
+
+    def get_id(self, user_id):
+        """Get one user
+
+        Args:
+            user_id (str): ObjectId
+
+        Returns:
+            dict: User, or None if not found
+        """
+        user_id = str(ObjectId(user_id))
+        with self.lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return None
+            return self._output(user_id, user)
+
+    def get_by_name(self, name):
+        """Get all users with the given name
+
+        Args:
+            name (str): User name
+
+        Returns:
+            list: List of users
+        """
+        with self.lock:
+            return [self._output(user_id, self.users[user_id])
+                    for user_id in self.names.get(name, ())]
+
+    def get_friend_of(self, user_id):
+        """Get the ids of all users that have user_id in their friend list
+
+        Args:
+            user_id (str): ObjectId
+
+        Returns:
+            list: List of user ids
+        """
+        with self.lock:
+            return list(self.friend_of.get(user_id, ()))
+
+    def create_user(self, new_data):
+        """Insert a new user
+
+        Args:
+            new_data (dict): Dictionary containing new user with corresponding fields
+
+        Returns:
+            str: Id of new user
+
+        Raises:
+            InvalidId: If the given _id is not a valid ObjectId
+            DuplicateKeyError: If a user with the given _id already exists, as in MongoDB
+        """
+        user = copy.deepcopy(new_data)
+        # Normalize a supplied _id the same way as the other methods
+        user_id = str(ObjectId(user.pop("_id", None)))
+        with self.lock:
+            if user_id in self.users:
+                raise DuplicateKeyError(f"Duplicate _id: {user_id}", 11000)
+            self.users[user_id] = user
+            self._index(user_id, user)
+        return user_id
+
+    def update(self, user_id, new_data) -> int:
+        """Set fields of a user
+
+        Args:
+            user_id (str): ObjectId
+            new_data (dict): Dictionary containing fields with updated values
+
+        Returns:
+            int: 1 if the user was modified, else 0
+        """
+        user_id = str(ObjectId(user_id))
+        new_data = copy.deepcopy(new_data)
+        new_data.pop("_id", None)
+        with self.lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return 0
+            updated = dict(user, **new_data)
+            if updated == user:
+                return 0
+            self._unindex(user_id, user)
+            self.users[user_id] = updated
+            self._index(user_id, updated)
+            return 1
+
+    def delete(self, user_id):
+        user_id = str(ObjectId(user_id))
+        with self.lock:
+            user = self.users.pop(user_id, None)
+            if user is not None:
+                self._unindex(user_id, user)
+        output = {
+            'deleted_count': 0 if user is None else 1,
+        }
+        return output
+
+    def validate_user(self, user_id):
+        """Checks if user_id exists in database
+
+        Args:
+            user_id (ObjectId): User's ID
+
+        Returns:
+            boolean: True if valid, else false
+        """
+        user_id = str(ObjectId(user_id))
+        with self.lock:
+            return user_id in self.users
+
+    def add_friend(self, user_id, friend_id):
+        """Finds user's friend list using user_id, then appends friend_id to the list
+        Before adding, need to validate if friend is a user too
+
+        Args:
+            user_id (ObjectId): User's ID
+            friend_id (ObjectId): Friend's ID
+
+        Returns:
+            dict: Dictionary containing user's ID and new list of friends
+        """
+        key = str(ObjectId(user_id))
+        with self.lock:
+            user = self.users.get(key)
+            if user is None or not self.validate_user(friend_id):
+                return {user_id: "unable to validate"}
+            self._unindex(key, user)
+            user.setdefault("friends", []).append(friend_id)
+            self._index(key, user)
+            return {user_id: list(user["friends"])}
+
+    def remove_friend(self, user_id, friend_id):
+        """Finds user's friend list using user_id, then removes friend_id from the list
+        Before removing, need to validate if friend is a user too
+
+        Args:
+            user_id (ObjectId): User's ID
+            friend_id (ObjectId): Friend to be removed's ID
+
+        Returns:
+            dict: Dictionary containing user's ID and new list of friends
+        """
+        key = str(ObjectId(user_id))
+        with self.lock:
+            user = self.users.get(key)
+            if user is None or not self.validate_user(friend_id):
+                return {user_id: "unable to validate"}
+            friends = user.get("friends", [])
+            if friend_id not in friends:
+                return {user_id: "friend not found in list"}
+            self._unindex(key, user)
+            friends.remove(friend_id)
+            self._index(key, user)
+            return {user_id: list(friends)}
+
+
+# Storage backends selectable by name in create_app
+BACKENDS = {
+    "mongo": MongoDatabase,
+    "memory": MemoryDatabase,
+}
@@ -1,14 +1,49 @@
 """Main module containing all APIs
 """
 import json
+import os
 from flask import Flask, jsonify, request, Response
-from database import MongoDatabase
+from database import BACKENDS
 from data import Data
+from profiling import Profiler
 
 
-def create_app(testing):
+def create_app(testing, backend=None, config=None):
+    """Creates the Flask app and its database
+
+    Args:
+        testing (bool): Use the test collection
+        backend (str, optional): Name of the storage backend in database.BACKENDS.
+            Defaults to the DATABASE_BACKEND environment variable, else "mongo"
+        config (dict, optional): Overrides for app.config, e.g. the PROFILE_* settings
+
+    Returns:
+        tuple: (flask.Flask, database.Database)
+    """
     app = Flask(__name__)
-    db = MongoDatabase(testing=testing)
+    backend = backend or os.environ.get("DATABASE_BACKEND", "mongo")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown database backend: {backend}")
+    app.config["DATABASE_BACKEND"] = backend
+    # Profiling is enabled if PROFILE_SAMPLE_RATE > 0 or PROFILE_THRESHOLD is set
+    threshold = os.environ.get("PROFILE_THRESHOLD")
+    app.config.update(
+        PROFILE_SAMPLE_RATE=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+        PROFILE_THRESHOLD=float(threshold) if threshold else None,
+        PROFILE_DIR=os.environ.get("PROFILE_DIR", "profiles"),
+        PROFILE_MAX=int(os.environ.get("PROFILE_MAX", 50)),
+        PROFILE_ADMIN=os.environ.get("PROFILE_ADMIN", "").lower() in ("1", "true", "yes"),
+    )
+    app.config.update(config or {})
+    if app.config["PROFILE_SAMPLE_RATE"] > 0 or app.config["PROFILE_THRESHOLD"] is not None:
+        # Created before the database so that pymongo commands are recorded
+        Profiler(app,
+                 directory=app.config["PROFILE_DIR"],
+                 sample_rate=app.config["PROFILE_SAMPLE_RATE"],
+                 threshold=app.config["PROFILE_THRESHOLD"],
+                 max_profiles=app.config["PROFILE_MAX"],
+                 admin=app.config["PROFILE_ADMIN"])
+    db = BACKENDS[backend](testing=testing)
     
     @app.route('/', methods=['GET'])
     def get_all_users():
@@ -0,0 +1,223 @@
+"""Module containing the opt-in request profiler
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from flask import g, has_app_context, request, Response
+from pymongo import monitoring
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Records the pymongo commands issued during the current request
+    """
+
+    def _commands(self):
+        if not has_app_context():
+            return None
+        return g.get("profile_commands")
+
+    def started(self, event):
+        commands = self._commands()
+        if commands is not None:
+            g.profile_pending[event.request_id] = event.command.get(event.command_name)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed):
+        commands = self._commands()
+        if commands is None:
+            return
+        collection = g.profile_pending.pop(event.request_id, None)
+        commands.append({
+            "command": event.command_name,
+            "database": event.database_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "duration_ms": event.duration_micros / 1000,
+            "failed": failed,
+        })
+
+
+_recorder = CommandRecorder()
+_recorder_lock = threading.Lock()
+_recorder_registered = False
+
+
+def register_command_recorder():
+    """Registers the command recorder with pymongo once per process.
+    Must be called before the MongoClient is created
+    """
+    global _recorder_registered
+    with _recorder_lock:
+        if not _recorder_registered:
+            monitoring.register(_recorder)
+            _recorder_registered = True
+
+
+class Profiler:
+    def __init__(self, app, directory="profiles", sample_rate=0.0, threshold=None,
+                 max_profiles=50, admin=False) -> None:
+        """Init
+
+        A request is profiled with cProfile if it is sampled. A request is
+        written to the ring buffer if it is sampled, or if it took longer
+        than threshold. Slow requests that were not sampled are written
+        without cProfile stats. Only one cProfile can run at a time, so a
+        sampled request that overlaps another profiled request is written
+        without stats ("profiled" is false in its record).
+
+        Args:
+            app (flask.Flask): Flask app
+            directory (str, optional): Directory of the on-disk ring buffer
+            sample_rate (float, optional): Fraction of requests to profile, from 0 to 1
+            threshold (float, optional): Latency in seconds above which requests are written
+            max_profiles (int, optional): Maximum number of profiles kept on disk
+            admin (bool, optional): Register GET /admin/profiles. The profiles
+                contain request paths and server file paths, and the route has no
+                authentication
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.max_profiles = max_profiles
+        self.logger = app.logger
+        self.lock = threading.Lock()
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+        register_command_recorder()
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        if admin:
+            app.add_url_rule('/admin/profiles', 'get_profiles', self.get_profiles,
+                             methods=['GET'])
+
+    def before_request(self):
+        if request.path.startswith('/admin/'):
+            return
+        g.profile_commands = []
+        g.profile_pending = {}
+        g.profile = None
+        g.profile_sampled = random.random() < self.sample_rate
+        if g.profile_sampled:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                g.profile = profile
+            except ValueError:
+                # Another profiler is already active (e.g. concurrent request)
+                pass
+        g.profile_start = time.perf_counter()
+
+    def after_request(self, response):
+        if g.get("profile_commands") is None or g.get("profile_start") is None:
+            return response
+        duration = time.perf_counter() - g.profile_start
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.disable()
+        slow = self.threshold is not None and duration >= self.threshold
+        if g.profile_sampled or slow:
+            self.write({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": duration * 1000,
+                "slow": slow,
+                "sampled": g.profile_sampled,
+                "profiled": profile is not None,
+                "commands": g.profile_commands,
+                "stats": self.format_stats(profile) if profile is not None else None,
+            })
+        return response
+
+    def teardown_request(self, exception):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.disable()
+        g.pop("profile_commands", None)
+
+    def format_stats(self, profile, limit=30):
+        """Formats the cProfile stats, sorted by cumulative time
+
+        Args:
+            profile (cProfile.Profile): Profile of the request
+            limit (int, optional): Number of functions to include
+
+        Returns:
+            str: pstats output
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def write(self, record):
+        """Writes a profile to the ring buffer, removing the oldest profiles
+        once there are more than max_profiles
+
+        Errors are logged and never fail the request. The directory may be
+        shared by several worker processes, so the profile is written to a
+        temporary file and moved into place, and profiles already removed by
+        another worker are ignored.
+
+        Args:
+            record (dict): Profile of a request
+        """
+        with self.lock:
+            self.count += 1
+            count = self.count
+        record["timestamp"] = time.time()
+        name = f"{time.time_ns()}-{os.getpid()}-{count:08d}.json"
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(record, f)
+            os.replace(path + '.tmp', path)
+            with self.lock:
+                names = self.list_profiles()
+                for old in names[:max(len(names) - self.max_profiles, 0)]:
+                    try:
+                        os.remove(os.path.join(self.directory, old))
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            self.logger.warning("Failed to write profile %s: %s", name, e)
+            try:
+                os.remove(path + '.tmp')
+            except OSError:
+                pass
+
+    def list_profiles(self):
+        """Returns:
+            list: File names of profiles in the ring buffer, oldest first
+        """
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.endswith('.json'))
+
+    def get_profiles(self):
+        """Dumps all profiles in the ring buffer, oldest first
+
+        Returns:
+            flask.wrapper.Response: Flask response
+        """
+        profiles = []
+        for name in self.list_profiles():
+            # Skip profiles removed or being written by another request or worker
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+        return Response(response=json.dumps({"profiles": profiles}),
+                        status=200,
+                        mimetype='application/json')
@@ -0,0 +1,124 @@
+import pytest
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+from main import *
+
+
+@pytest.fixture
+def client():
+    """Initiates dict of client and in-memory db to be passed into other tests as fixture
+
+    Yields:
+        dict: dict(client, database)
+    """
+    app, db = create_app(testing=True, backend="memory")
+    client = app.test_client()
+    yield {"client": client, "db": db}
+
+
+def test_create_and_get_user(client):
+    """Creates a user and gets it back without a MongoDB
+    """
+    data_1 = {
+        "name": "tester1",
+        "description": "description_1"
+    }
+    r = client["client"].post("/", json=data_1)
+    assert r.status_code == 201
+    user_id = r.json["Created user"]["_id"]["$oid"]
+    for k, v in data_1.items():
+        assert r.json["Created user"][k] == v
+
+    r_get = client["client"].get("/" + user_id)
+    assert r_get.status_code == 200
+    assert r_get.json["get user"] == user_id
+
+    r_all = client["client"].get("/")
+    assert r_all.json["get all users"][0]["_id"] == user_id
+
+
+def test_get_invalid_user(client):
+    """Invalid ids return 400 and unknown ids return 404, as with MongoDB
+    """
+    assert client["client"].get("/not-an-id").status_code == 400
+    assert client["client"].get("/635aae9f3e87bc873c34dd0b").status_code == 404
+
+
+def test_update_and_delete_user(client):
+    """Updates then deletes a user, keeping the name index in sync
+    """
+    r = client["client"].post("/", json={"name": "tester1"})
+    user_id = r.json["Created user"]["_id"]["$oid"]
+
+    r_update = client["client"].put("/" + user_id, json={"name": "tester2"})
+    assert r_update.status_code == 200
+    assert client["db"].get_by_name("tester1") == []
+    assert client["db"].get_by_name("tester2")[0]["_id"]["$oid"] == user_id
+
+    r_delete = client["client"].delete("/" + user_id)
+    assert r_delete.status_code == 200
+    assert client["db"].get_by_name("tester2") == []
+    assert client["client"].delete("/" + user_id).status_code == 404
+    assert client["client"].put("/" + user_id, json={"name": "tester3"}).status_code == 304
+
+
+def test_create_duplicate_id(client):
+    """Creating a user with an existing _id is rejected and leaves the name index in sync
+    """
+    r = client["client"].post("/", json={"name": "tester1"})
+    user_id = r.json["Created user"]["_id"]["$oid"]
+
+    with pytest.raises(DuplicateKeyError):
+        client["db"].create_user({"_id": user_id, "name": "tester2"})
+    assert client["db"].get_id(user_id)["name"] == "tester1"
+    assert client["db"].get_by_name("tester1")[0]["_id"]["$oid"] == user_id
+    assert client["db"].get_by_name("tester2") == []
+
+
+def test_create_supplied_id(client):
+    """A supplied _id is normalized, and an invalid _id is rejected before anything is stored
+    """
+    r = client["client"].post("/", json={"_id": "635AAE9F3E87BC873C34DD0B", "name": "tester1"})
+    assert r.status_code == 201
+    assert r.json["Created user"]["_id"]["$oid"] == "635aae9f3e87bc873c34dd0b"
+    assert client["client"].delete("/635AAE9F3E87BC873C34DD0B").status_code == 200
+
+    with pytest.raises(InvalidId):
+        client["db"].create_user({"_id": "abc", "name": "tester2"})
+    assert client["db"].get_all() == []
+    assert client["db"].get_by_name("tester2") == []
+
+
+def test_add_and_remove_friend(client):
+    """Adds and removes a friend, keeping the friend index in sync
+    """
+    r_1 = client["client"].post("/", json={"name": "tester1"})
+    user_id_1 = r_1.json["Created user"]["_id"]["$oid"]
+    r_2 = client["client"].post("/", json={"name": "tester2"})
+    user_id_2 = r_2.json["Created user"]["_id"]["$oid"]
+
+    r_add = client["client"].put("/addfriend/" + user_id_1, json={"friends": user_id_2})
+    assert r_add.status_code == 200
+    assert r_add.json["added friend"][user_id_1] == [user_id_2]
+    assert client["db"].get_friend_of(user_id_2) == [user_id_1]
+
+    r_invalid = client["client"].put("/addfriend/" + user_id_1,
+                                     json={"friends": "635aae9f3e87bc873c34dd0b"})
+    assert r_invalid.status_code == 400
+    assert r_invalid.json["error"][user_id_1] == "unable to validate"
+
+    r_remove = client["client"].post("/removefriend/" + user_id_1, json={"friends": user_id_2})
+    assert r_remove.status_code == 200
+    assert r_remove.json["removed friend"][user_id_1] == []
+    assert client["db"].get_friend_of(user_id_2) == []
+
+    r_remove = client["client"].post("/removefriend/" + user_id_1, json={"friends": user_id_2})
+    assert r_remove.status_code == 400
+    assert r_remove.json["error"][user_id_1] == "friend not found in list"
+
+
+def test_unknown_backend():
+    """Unknown backend names are rejected
+    """
+    with pytest.raises(ValueError):
+        create_app(testing=True, backend="unknown")
@@ -0,0 +1,157 @@
+import os
+import pytest
+from types import SimpleNamespace
+from pymongo import monitoring
+from main import *
+import profiling
+from profiling import CommandRecorder
+
+
+def profiling_client(tmp_path, **config):
+    """Creates a test client on the in-memory backend with profiling enabled
+
+    Returns:
+        flask.testing.FlaskClient: Test client
+    """
+    config = {"PROFILE_DIR": str(tmp_path), "PROFILE_ADMIN": True, **config}
+    app, db = create_app(testing=True, backend="memory", config=config)
+    return app.test_client()
+
+
+def test_profiling_disabled():
+    """Admin endpoint is not registered unless profiling is enabled
+    """
+    app, db = create_app(testing=True, backend="memory")
+    assert app.test_client().get("/admin/profiles").status_code == 404
+
+
+def test_admin_disabled(tmp_path):
+    """Admin endpoint is not registered unless PROFILE_ADMIN is set
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0, PROFILE_ADMIN=False)
+    client.get("/")
+    assert client.get("/admin/profiles").status_code == 404
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_sampled_requests(tmp_path):
+    """All requests are profiled with a sample rate of 1
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0)
+    client.post("/", json={"name": "tester1"})
+    client.get("/")
+
+    r = client.get("/admin/profiles")
+    assert r.status_code == 200
+    profiles = r.json["profiles"]
+    assert [p["method"] for p in profiles] == ["POST", "GET"]
+    assert profiles[0]["status"] == 201
+    assert profiles[0]["sampled"] and profiles[0]["profiled"]
+    assert "cumulative" in profiles[0]["stats"]
+
+
+def test_slow_requests(tmp_path):
+    """Requests over the threshold are written without cProfile stats
+    """
+    client = profiling_client(tmp_path, PROFILE_THRESHOLD=0.0)
+    client.get("/")
+
+    profiles = client.get("/admin/profiles").json["profiles"]
+    assert len(profiles) == 1
+    assert profiles[0]["slow"]
+    assert not profiles[0]["profiled"]
+    assert profiles[0]["stats"] is None
+
+    client = profiling_client(tmp_path / "fast", PROFILE_THRESHOLD=60.0)
+    client.get("/")
+    assert client.get("/admin/profiles").json["profiles"] == []
+
+
+def test_ring_buffer(tmp_path):
+    """Only the newest PROFILE_MAX profiles are kept on disk
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX=2)
+    for i in range(4):
+        client.get("/635aae9f3e87bc873c34dd0" + str(i))
+
+    profiles = client.get("/admin/profiles").json["profiles"]
+    assert [p["path"] for p in profiles] == ["/635aae9f3e87bc873c34dd02",
+                                             "/635aae9f3e87bc873c34dd03"]
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_command_recorder(tmp_path):
+    """pymongo commands issued during a request are attached to its profile
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0)
+    recorder = CommandRecorder()
+
+    @client.application.route("/fake-command")
+    def fake_command():
+        recorder.started(SimpleNamespace(request_id=1, command_name="find",
+                                         command={"find": "users"}))
+        recorder.succeeded(SimpleNamespace(request_id=1, command_name="find",
+                                           database_name="db", duration_micros=1500))
+        return "ok"
+
+    client.get("/fake-command")
+    command = client.get("/admin/profiles").json["profiles"][0]["commands"][0]
+    assert command == {"command": "find", "database": "db", "collection": "users",
+                       "duration_ms": 1.5, "failed": False}
+
+
+def test_write_failure(tmp_path, monkeypatch):
+    """Requests keep their status if the profile cannot be written or pruned
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX=1)
+    client.get("/")
+
+    def remove(path):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(profiling.os, "remove", remove)
+    assert client.get("/").status_code == 200
+
+    def replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.undo()
+    monkeypatch.setattr(profiling.os, "replace", replace)
+    assert client.post("/", json={"name": "tester1"}).status_code == 201
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_partial_profile(tmp_path):
+    """Profiles that are partly written are skipped when dumped
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0)
+    client.get("/")
+    with open(os.path.join(tmp_path, "9999999999999999999-0-00000000.json"), 'w') as f:
+        f.write('{"method": ')
+
+    profiles = client.get("/admin/profiles").json["profiles"]
+    assert len(profiles) == 1
+
+
+def test_command_recorder_registered(tmp_path):
+    """The recorder is registered before the MongoClient is created
+    """
+    app, db = create_app(testing=True, backend="mongo",
+                         config={"PROFILE_DIR": str(tmp_path), "PROFILE_SAMPLE_RATE": 1.0})
+    assert profiling._recorder in monitoring._LISTENERS.command_listeners
+    assert profiling._recorder in db.client.options.event_listeners
+
+
+def test_profiler_unavailable(tmp_path, monkeypatch):
+    """Sampled requests are written without stats if cProfile cannot be enabled
+    """
+    client = profiling_client(tmp_path, PROFILE_SAMPLE_RATE=1.0)
+
+    class Profile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+    monkeypatch.setattr(profiling.cProfile, "Profile", Profile)
+    assert client.get("/").status_code == 200
+
+    profiles = client.get("/admin/profiles").json["profiles"]
+    assert profiles[0]["sampled"]
+    assert not profiles[0]["profiled"]
+    assert profiles[0]["stats"] is None